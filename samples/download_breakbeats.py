@@ -10,13 +10,18 @@ the .wav files to ./wav and .rx2 files to ./rx2 directories.
 It also reports any missing files with debug information.
 """
 
+import asyncio
+import hashlib
 import os
 import re
 import sys
-import requests
+from functools import lru_cache
+import aiofiles
+import aiohttp
+import numpy as np
 from pathlib import Path
 from urllib.parse import unquote
-from difflib import SequenceMatcher
+from rapidfuzz import fuzz, process
 import time
 
 # Configuration
@@ -25,6 +30,21 @@ SAMPLES_FILE = "samples.txt"
 WAV_DIR = "wav"
 RX2_DIR = "rx2"
 LOG_FILE = "download_log.txt"
+MAX_CONCURRENT_DOWNLOADS = 8
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+DOWNLOAD_RETRIES = 5
+RETRY_BACKOFF = 0.3  # seconds, doubled on each retry
+MATCH_CACHE_DIR = ".match_cache"
+MATCH_SCORER = "fuzz.ratio/lower"  # Bump to invalidate cached scores if matching changes
+
+# Download link pattern, matched against the raw HTML bytes. The explicit character
+# classes replace re.IGNORECASE (the page has .wav, .WAV and .Wav links)
+_LINK_RE = re.compile(
+    rb'<a href="(https://rhythm-lab\.com/sstorage/[^"]+\.([wW][aA][vV]|[rR][xX]2))"[^>]*>([^<]+)</a>'
+)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_SPECIAL_CHARS_RE = re.compile(r'[^\w\s-]')
 
 # Create directories if they don't exist
 os.makedirs(WAV_DIR, exist_ok=True)
@@ -32,7 +52,7 @@ os.makedirs(RX2_DIR, exist_ok=True)
 
 class BreakbeatsDownloader:
     def __init__(self):
-        self.html_content = ""
+        self.html_content = b""
         self.wanted_samples = []
         self.available_links = {}
         self.download_log = []
@@ -41,7 +61,7 @@ class BreakbeatsDownloader:
     def load_html(self):
         """Load the HTML content from the file"""
         try:
-            with open(HTML_FILE, 'r', encoding='utf-8') as f:
+            with open(HTML_FILE, 'rb') as f:
                 self.html_content = f.read()
             print(f"✓ Loaded HTML file: {HTML_FILE}")
         except FileNotFoundError:
@@ -68,10 +88,10 @@ class BreakbeatsDownloader:
 
     def extract_download_links(self):
         """Extract all download links from the HTML"""
-        pattern = r'<a href="(https://rhythm-lab\.com/sstorage/[^"]+\.(wav|rx2|WAV|RX2))"[^>]*>([^<]+)</a>'
-        matches = re.findall(pattern, self.html_content, re.IGNORECASE)
+        for match in _LINK_RE.finditer(self.html_content):
+            # Only the captured groups are decoded, not the whole page
+            url, ext, filename = (group.decode('utf-8') for group in match.groups())
 
-        for url, ext, filename in matches:
             # Clean up the filename
             clean_filename = filename.strip()
             if clean_filename not in self.available_links:
@@ -82,29 +102,42 @@ class BreakbeatsDownloader:
 
         print(f"✓ Extracted {len(self.available_links)} unique samples from HTML")
 
-    def similarity(self, a, b):
-        """Calculate similarity between two strings"""
-        return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+    def score_matrix(self, queries, choices):
+        """Similarity (0-100) of every query against every choice, cached on disk"""
+        # Key on the exact (ordered) inputs, since rows/columns index into them
+        key = hashlib.blake2b(
+            repr((MATCH_SCORER, tuple(queries), tuple(choices))).encode('utf-8'),
+            digest_size=16
+        ).hexdigest()
+        cache_file = os.path.join(MATCH_CACHE_DIR, f"{key}.npz")
+
+        if os.path.exists(cache_file):
+            try:
+                with np.load(cache_file) as cached:
+                    scores = cached['scores']
+                print(f"✓ Loaded match scores from cache: {cache_file}")
+                return scores
+            except Exception as e:
+                print(f"⚠ Ignoring unreadable match cache {cache_file}: {e}")
+
+        scores = process.cdist(queries, choices, scorer=fuzz.ratio,
+                               processor=str.lower, workers=-1)
 
-    def find_best_match(self, wanted_sample):
-        """Find the best matching sample in available links"""
-        best_match = None
-        best_score = 0
-
-        for available_sample in self.available_links.keys():
-            score = self.similarity(wanted_sample, available_sample)
-            if score > best_score:
-                best_score = score
-                best_match = available_sample
-
-        return best_match, best_score
-
-    def normalize_sample_name(self, sample_name):
-        """Normalize sample name for better matching"""
+        try:
+            os.makedirs(MATCH_CACHE_DIR, exist_ok=True)
+            np.savez_compressed(cache_file, scores=scores)
+        except OSError as e:
+            print(f"⚠ Could not write match cache {cache_file}: {e}")
+        return scores
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def normalize_sample_name(sample_name):
+        """Normalize sample name for better matching (memoized)"""
         # Remove common variations and normalize
         normalized = sample_name.lower()
-        normalized = re.sub(r'\s+', ' ', normalized)  # Multiple spaces to single
-        normalized = re.sub(r'[^\w\s-]', '', normalized)  # Remove special chars except dash
+        normalized = _WHITESPACE_RE.sub(' ', normalized)  # Multiple spaces to single
+        normalized = _SPECIAL_CHARS_RE.sub('', normalized)  # Remove special chars except dash
         normalized = normalized.strip()
         return normalized
 
@@ -112,70 +145,129 @@ class BreakbeatsDownloader:
         """Match wanted samples with available links"""
         matched_samples = {}
 
+        available = list(self.available_links.keys())
+
+        # Exact matches on the normalized name are a dict lookup; first occurrence wins.
+        # Link names carry their .wav/.rx2 extension, which samples.txt entries don't
+        norm_index = {}
+        for name in available:
+            stem, ext = os.path.splitext(name)
+            key = stem if ext.lower() in ('.wav', '.rx2') else name
+            norm_index.setdefault(self.normalize_sample_name(key), name)
+        exact_matches = {wanted: norm_index.get(self.normalize_sample_name(wanted))
+                         for wanted in self.wanted_samples}
+
+        # Only the samples without an exact match go through fuzzy scoring
+        fuzzy_wanted = [wanted for wanted, hit in exact_matches.items() if hit is None]
+        scores = self.score_matrix(fuzzy_wanted, available) if fuzzy_wanted and available else None
+        fuzzy_rows = {wanted: row for row, wanted in enumerate(fuzzy_wanted)}
+
         for wanted in self.wanted_samples:
             print(f"\n🔍 Searching for: {wanted}")
 
-            # Try exact match first
-            exact_match = None
-            for available in self.available_links.keys():
-                if self.similarity(wanted, available) > 0.9:  # Very high similarity
-                    exact_match = available
-                    break
-
-            if exact_match:
-                matched_samples[wanted] = exact_match
-                print(f"  ✓ Found exact match: {exact_match}")
+            if exact_matches[wanted] is not None:
+                matched_samples[wanted] = exact_matches[wanted]
+                print(f"  ✓ Found exact match: {exact_matches[wanted]}")
+                continue
+
+            best_match = None
+            score = 0
+            if scores is not None:
+                row = scores[fuzzy_rows[wanted]]
+                best_index = int(row.argmax())
+                best_match = available[best_index]
+                score = float(row[best_index]) / 100.0
+
+            if score > 0.9:  # Very high similarity
+                matched_samples[wanted] = best_match
+                print(f"  ✓ Found exact match: {best_match}")
+            elif score > 0.6:  # Reasonable similarity threshold
+                matched_samples[wanted] = best_match
+                print(f"  ∼ Found fuzzy match ({score:.2f}): {best_match}")
             else:
-                # Try fuzzy matching
-                best_match, score = self.find_best_match(wanted)
-                if score > 0.6:  # Reasonable similarity threshold
-                    matched_samples[wanted] = best_match
-                    print(f"  ∼ Found fuzzy match ({score:.2f}): {best_match}")
-                else:
-                    self.missing_samples.append({
-                        'wanted': wanted,
-                        'best_match': best_match,
-                        'score': score
-                    })
-                    print(f"  ✗ No good match found (best: {best_match}, score: {score:.2f})")
+                self.missing_samples.append({
+                    'wanted': wanted,
+                    'best_match': best_match,
+                    'score': score
+                })
+                print(f"  ✗ No good match found (best: {best_match}, score: {score:.2f})")
 
         return matched_samples
 
-    def download_file(self, url, filepath):
+    async def download_file(self, session, sem, url, filepath):
         """Download a file from URL to filepath"""
-        try:
-            print(f"    Downloading: {os.path.basename(filepath)}")
-
-            # Check if file already exists
-            if os.path.exists(filepath):
-                print(f"    ⚠ File already exists, skipping: {os.path.basename(filepath)}")
-                return True
-
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-
-            file_size = os.path.getsize(filepath)
-            print(f"    ✓ Downloaded: {os.path.basename(filepath)} ({file_size:,} bytes)")
+        # Check if file already exists
+        if os.path.exists(filepath):
+            print(f"    ⚠ File already exists, skipping: {os.path.basename(filepath)}")
             return True
 
-        except requests.exceptions.RequestException as e:
-            print(f"    ✗ Download failed: {e}")
-            return False
-        except Exception as e:
-            print(f"    ✗ Error: {e}")
-            return False
-
-    def download_matched_samples(self, matched_samples):
-        """Download all matched samples"""
+        # Write under a temporary name so a half-written file never looks finished
+        part_path = filepath + '.part'
+
+        async with sem:
+            for attempt in range(DOWNLOAD_RETRIES + 1):
+                try:
+                    print(f"    Downloading: {os.path.basename(filepath)}")
+
+                    async with session.get(url) as response:
+                        response.raise_for_status()
+                        expected_size = response.content_length or 0
+
+                        async with aiofiles.open(part_path, 'wb') as f:
+                            loop = asyncio.get_running_loop()
+
+                            # Reserve the whole file up front so it lands in contiguous extents.
+                            # Run it off the loop: without native support glibc writes every block
+                            if expected_size and hasattr(os, 'posix_fallocate'):
+                                try:
+                                    await loop.run_in_executor(None, os.posix_fallocate,
+                                                               f.fileno(), 0, expected_size)
+                                except OSError:
+                                    pass  # Filesystem doesn't support it; just write normally
+
+                            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                                await f.write(chunk)
+
+                            # Trim the reservation if the body came out shorter (e.g. decompressed)
+                            await f.truncate()
+                            await f.flush()
+
+                            # Samples aren't read back by this script, so don't keep them in page cache.
+                            # The kernel only drops clean pages, so write them back first (off the loop)
+                            if hasattr(os, 'posix_fadvise') and hasattr(os, 'fdatasync'):
+                                await loop.run_in_executor(None, os.fdatasync, f.fileno())
+                                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+                    os.replace(part_path, filepath)
+                    file_size = os.path.getsize(filepath)
+                    print(f"    ✓ Downloaded: {os.path.basename(filepath)} ({file_size:,} bytes)")
+                    return True
+
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # Client errors (404 etc.) won't fix themselves; connection drops and 5xx might
+                    retryable = not (isinstance(e, aiohttp.ClientResponseError)
+                                     and e.status < 500 and e.status != 429)
+                    if retryable and attempt < DOWNLOAD_RETRIES:
+                        delay = RETRY_BACKOFF * (2 ** attempt)
+                        print(f"    ↻ Retrying {os.path.basename(filepath)} in {delay:.1f}s: {e!r}")
+                        await asyncio.sleep(delay)
+                        continue
+                    print(f"    ✗ Download failed: {os.path.basename(filepath)}: {e!r}")
+                except Exception as e:
+                    print(f"    ✗ Error: {os.path.basename(filepath)}: {e}")
+
+                # Drop this attempt's partial file; the final path is never touched
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                return False
+
+    async def download_matched_samples(self, matched_samples):
+        """Download all matched samples concurrently"""
         print(f"\n📥 Starting downloads for {len(matched_samples)} matched samples...")
 
-        success_count = 0
-        total_files = 0
-
+        # Collect every (url, filepath) pair up front
+        jobs = []
+        downloads = {}  # filepath -> url, one download per unique destination
         for wanted, matched in matched_samples.items():
             print(f"\n🎵 Processing: {wanted}")
             print(f"  → Matched with: {matched}")
@@ -183,36 +275,44 @@ class BreakbeatsDownloader:
             if matched in self.available_links:
                 links = self.available_links[matched]
 
-                # Download WAV file
-                if 'wav' in links:
-                    total_files += 1
-                    safe_filename = re.sub(r'[<>:"/\\|?*]', '_', matched)
-                    if not safe_filename.endswith('.wav'):
-                        safe_filename += '.wav'
-                    filepath = os.path.join(WAV_DIR, safe_filename)
-
-                    if self.download_file(links['wav'], filepath):
-                        success_count += 1
-                        self.download_log.append(f"SUCCESS: {wanted} -> {safe_filename} (WAV)")
-                    else:
-                        self.download_log.append(f"FAILED: {wanted} -> {safe_filename} (WAV)")
-
-                # Download RX2 file
-                if 'rx2' in links:
-                    total_files += 1
-                    safe_filename = re.sub(r'[<>:"/\\|?*]', '_', matched)
-                    if not safe_filename.endswith('.rx2'):
-                        safe_filename += '.rx2'
-                    filepath = os.path.join(RX2_DIR, safe_filename)
-
-                    if self.download_file(links['rx2'], filepath):
-                        success_count += 1
-                        self.download_log.append(f"SUCCESS: {wanted} -> {safe_filename} (RX2)")
-                    else:
-                        self.download_log.append(f"FAILED: {wanted} -> {safe_filename} (RX2)")
-
-                # Add small delay between downloads to be respectful
-                time.sleep(0.5)
+                for ext, directory in (('wav', WAV_DIR), ('rx2', RX2_DIR)):
+                    if ext in links:
+                        safe_filename = re.sub(r'[<>:"/\\|?*]', '_', matched)
+                        if not safe_filename.endswith(f'.{ext}'):
+                            safe_filename += f'.{ext}'
+                        filepath = os.path.join(directory, safe_filename)
+                        jobs.append((wanted, safe_filename, ext, filepath))
+                        downloads.setdefault(filepath, links[ext])
+
+        # The semaphore bounds in-flight downloads to keep the load on the server polite
+        sem = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        # One pooled, keep-alive connector for the whole run, so TLS handshakes are reused
+        connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_DOWNLOADS,
+                                         limit_per_host=MAX_CONCURRENT_DOWNLOADS,
+                                         keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(sock_connect=30, sock_read=30)
+
+        # aiohttp buffers 64 KiB per read by default, which would cap chunks well below
+        # DOWNLOAD_CHUNK_SIZE; raise it so each iteration really moves ~1 MiB
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         read_bufsize=DOWNLOAD_CHUNK_SIZE) as session:
+            results = await asyncio.gather(*(
+                self.download_file(session, sem, url, filepath)
+                for filepath, url in downloads.items()
+            ))
+
+        # Several wanted samples can match the same link; each gets that download's result
+        results = dict(zip(downloads, results))
+
+        success_count = 0
+        total_files = len(jobs)
+
+        for wanted, safe_filename, ext, filepath in jobs:
+            if results[filepath]:
+                success_count += 1
+                self.download_log.append(f"SUCCESS: {wanted} -> {safe_filename} ({ext.upper()})")
+            else:
+                self.download_log.append(f"FAILED: {wanted} -> {safe_filename} ({ext.upper()})")
 
         print(f"\n📊 Download Summary:")
         print(f"  Successfully downloaded: {success_count}/{total_files} files")
@@ -286,7 +386,7 @@ class BreakbeatsDownloader:
 
         # Download
         if matched_samples:
-            self.download_matched_samples(matched_samples)
+            asyncio.run(self.download_matched_samples(matched_samples))
         else:
             print("\n❌ No samples matched! Check the samples.txt file and HTML content.")
 
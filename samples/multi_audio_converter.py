@@ -4,64 +4,125 @@ Multi-Audio Binary Generator for Pi Pico
 Converts a folder of WAV files to a single binary with file system structure
 """
 
-import librosa
 import numpy as np
+import soundfile as sf
+import soxr
 import struct
 import argparse
 import os
 import glob
+import mmap
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
 # Binary format structures
 MAGIC_HEADER = b'PICO'  # 4 bytes magic number
-VERSION = 1             # 4 bytes version
+VERSION = 1             # 4 bytes version (float32 bundles, byte-compatible with old readers)
+VERSION_SAMPLE_FORMATS = 2  # Version for non-f32 bundles, so old readers reject them
+HEADER_STRUCT = struct.Struct('<4sIII')       # magic, version, file count, sample rate
+FILE_ENTRY_STRUCT = struct.Struct('<16sIIfI') # name, offset, samples, duration, sample format
 
-def wav_to_float_array(input_file, sample_rate=44100, normalize=True, max_length_ms=None, force_mono=True):
+# Sample format codes, stored in each file entry (0 keeps old float32 bundles valid)
+SAMPLE_FORMATS = {
+    'f32': 0,   # little-endian float32
+    'i16': 1,   # little-endian int16 PCM
+    'bf16': 2,  # little-endian bfloat16 (upper half of a float32)
+}
+SAMPLE_BYTES = {'f32': 4, 'i16': 2, 'bf16': 2}
+
+def bundle_version(sample_format):
+    """Header version for a bundle with the given sample format"""
+    return VERSION if sample_format == 'f32' else VERSION_SAMPLE_FORMATS
+
+def encode_samples(audio_data, sample_format='f32'):
+    """
+    Encode float samples as the little-endian payload for a sample format
+    
+    Args:
+        audio_data: Float audio samples in [-1, 1]
+        sample_format: One of SAMPLE_FORMATS
+    
+    Returns:
+        ndarray: Contiguous array ready for tofile()
+    """
+    if sample_format == 'i16':
+        return np.clip(np.rint(audio_data * 32767), -32768, 32767).astype('<i2')
+    
+    if sample_format == 'bf16':
+        bits = np.ascontiguousarray(audio_data, dtype='<f4').view('<u4')
+        # Round to nearest even before dropping the low 16 mantissa bits
+        return ((bits + 0x7FFF + ((bits >> 16) & 1)) >> 16).astype('<u2')
+    
+    return np.ascontiguousarray(audio_data, dtype='<f4')
+
+def wav_to_float_array(input_file, sample_rate=44100, normalize=True, max_length_ms=None, force_mono=True,
+                       num_frames=None):
     """
     Convert WAV file to float array
     
+    Runs in a worker process, so it does not print; the caller reports progress.
+    
     Args:
         input_file: Path to WAV file
         sample_rate: Target sample rate
         normalize: Whether to normalize audio
         max_length_ms: Maximum length in milliseconds (None for no limit)
         force_mono: Force conversion to mono
+        num_frames: Pad or trim the resampled audio to exactly this many frames
+                    (None to keep whatever the resampler produces)
     
     Returns:
-        tuple: (audio_data, actual_sample_rate, was_truncated)
+        tuple: (filename_stem, audio_data, actual_sample_rate, was_truncated,
+                original_duration, raw (min, max), normalized (min, max) or None)
     """
-    print(f"Processing: {input_file}")
-    
-    # Load audio file with librosa (mono=force_mono)
-    audio_data, sr = librosa.load(input_file, sr=sample_rate, mono=force_mono)
+    # Decode with soundfile; stereo comes back as (frames, channels)
+    audio_data, sr = sf.read(input_file, dtype='float32', always_2d=False)
+    if force_mono and audio_data.ndim == 2:
+        audio_data = audio_data.mean(axis=1, dtype=np.float32)
+    
+    # Resample with soxr if the file isn't already at the target rate
+    if sr != sample_rate:
+        audio_data = soxr.resample(audio_data, sr, sample_rate)
+        sr = sample_rate
+    
+    # Pin the length to what the caller already put in the file table
+    if num_frames is not None and len(audio_data) != num_frames:
+        if len(audio_data) > num_frames:
+            audio_data = audio_data[:num_frames]
+        else:
+            padding = np.zeros((num_frames - len(audio_data),) + audio_data.shape[1:], dtype=np.float32)
+            audio_data = np.concatenate((audio_data, padding))
     
     was_truncated = False
+    original_duration = len(audio_data) / sr
     
-    # Check if we need to truncate based on max length
+    # Check if we need to truncate based on max length (slice before any scans)
     if max_length_ms is not None:
         max_samples = int((max_length_ms / 1000.0) * sr)
         if len(audio_data) > max_samples:
             audio_data = audio_data[:max_samples]
             was_truncated = True
-            print(f"  Truncated from {len(audio_data)/sr:.2f}s to {max_length_ms/1000.0:.2f}s")
     
-    print(f"  Channels: {'Mono' if force_mono else 'Original'}")
-    print(f"  Length: {len(audio_data)} samples ({len(audio_data)/sr:.2f}s)")
-    if was_truncated:
-        print(f"  ** TRUNCATED ** (was longer than {max_length_ms}ms)")
-    print(f"  Range: [{np.min(audio_data):.3f}, {np.max(audio_data):.3f}]")
+    if len(audio_data) == 0:
+        return Path(input_file).stem, audio_data, sr, was_truncated, original_duration, (0.0, 0.0), None
+    
+    # One min and one max scan give both the logged range and the peak
+    lo, hi = float(audio_data.min()), float(audio_data.max())
     
-    # Normalize if requested
+    # Normalize in place if requested
+    normalized_range = None
     if normalize:
-        max_val = np.max(np.abs(audio_data))
-        if max_val > 0:
-            audio_data = audio_data / max_val
-            print(f"  Normalized to: [{np.min(audio_data):.3f}, {np.max(audio_data):.3f}]")
+        peak = max(-lo, hi)
+        if peak > 0:
+            np.multiply(audio_data, 1.0 / peak, out=audio_data)
+            normalized_range = (lo / peak, hi / peak)
     
-    return audio_data, sr, was_truncated
+    return Path(input_file).stem, audio_data, sr, was_truncated, original_duration, (lo, hi), normalized_range
 
 def create_multi_audio_binary(folder_path, output_file, sample_rate=44100, normalize=True, 
-                             max_length_ms=None, force_mono=True):
+                             max_length_ms=None, force_mono=True, jobs=None, sample_format='f32'):
     """
     Create binary file with multiple audio files and file system structure
     
@@ -72,11 +133,13 @@ def create_multi_audio_binary(folder_path, output_file, sample_rate=44100, norma
         normalize: Whether to normalize audio
         max_length_ms: Maximum length in milliseconds (None for no limit)
         force_mono: Force conversion to mono
+        jobs: Number of worker processes for decoding (None for one per CPU)
+        sample_format: Sample encoding, one of SAMPLE_FORMATS ('f32', 'i16', 'bf16')
     
     Binary format:
     - Header (16 bytes):
       - Magic: 'PICO' (4 bytes)
-      - Version: uint32 (4 bytes) 
+      - Version: uint32 (4 bytes) - 1 for f32 bundles, 2 for i16/bf16
       - File count: uint32 (4 bytes)
       - Sample rate: uint32 (4 bytes)
     
@@ -85,10 +148,13 @@ def create_multi_audio_binary(folder_path, output_file, sample_rate=44100, norma
       - Offset: uint32 (4 bytes) - offset to audio data
       - Sample count: uint32 (4 bytes)
       - Duration: float (4 bytes) - duration in seconds
-      - Reserved: uint32 (4 bytes) - for future use
+      - Sample format: uint32 (4 bytes) - 0 = float32, 1 = int16, 2 = bfloat16
     
     - Audio Data:
-      - Raw float samples for each file
+      - Raw little-endian samples for each file, in the sample format
+    
+    Returns:
+        dict: Bundle metadata as returned by read_bundle_info (False on failure)
     """
     
     # Find all WAV files in folder
@@ -108,89 +174,142 @@ def create_multi_audio_binary(folder_path, output_file, sample_rate=44100, norma
     if force_mono:
         print(f"Converting all files to mono")
     
-    # Process all audio files
-    audio_data_list = []
+    # First pass reads only the WAV headers: offsets depend on sample counts alone,
+    # so the whole file table can be written before any audio is decoded
     file_info_list = []
     skipped_files = []
     truncated_files = []
     
+    max_samples = int((max_length_ms / 1000.0) * sample_rate) if max_length_ms is not None else None
+    
     for wav_file in wav_files:
         try:
-            audio_data, sr, was_truncated = wav_to_float_array(
-                wav_file, sample_rate, normalize, max_length_ms, force_mono
-            )
-            
-            # Skip empty files
-            if len(audio_data) == 0:
-                print(f"  Warning: Skipping empty file")
-                skipped_files.append(wav_file)
-                continue
-            
-            # Extract filename (without extension, max 15 chars + null terminator)
-            filename = Path(wav_file).stem[:15]
-            
-            file_info = {
-                'name': filename,
-                'samples': len(audio_data),
-                'duration': len(audio_data) / sr,
-                'data': audio_data,
-                'was_truncated': was_truncated
-            }
-            
-            audio_data_list.append(audio_data)
-            file_info_list.append(file_info)
-            
-            if was_truncated:
-                truncated_files.append(wav_file)
-                
+            wav_info = sf.info(wav_file)
         except Exception as e:
-            print(f"  Error processing {wav_file}: {e}")
+            print(f"Error reading {wav_file}: {e}")
             skipped_files.append(wav_file)
+            continue
+        
+        # Length after resampling, rounded the same way soxr sizes its output
+        frames = wav_info.frames
+        if wav_info.samplerate != sample_rate:
+            frames = int(frames * sample_rate / wav_info.samplerate + 0.5)
+        
+        was_truncated = max_samples is not None and frames > max_samples
+        samples = max_samples if was_truncated else frames
+        
+        # Skip empty files
+        if samples == 0:
+            print(f"Warning: Skipping empty file {wav_file}")
+            skipped_files.append(wav_file)
+            continue
+        
+        file_info_list.append({
+            'path': wav_file,
+            'name': Path(wav_file).stem[:15],  # Without extension, max 15 chars + null terminator
+            'frames': frames,
+            'samples': samples,
+            'values': samples * (1 if force_mono else wav_info.channels),
+            'duration': samples / sample_rate,
+            'was_truncated': was_truncated
+        })
+        
+        if was_truncated:
+            truncated_files.append(wav_file)
     
     if not file_info_list:
         print("No valid audio files to process!")
         return False
     
     # Calculate offsets
-    header_size = 16  # Magic + version + file_count + sample_rate
-    file_table_size = len(file_info_list) * 32  # 32 bytes per file entry
+    header_size = HEADER_STRUCT.size  # Magic + version + file_count + sample_rate
+    file_table_size = len(file_info_list) * FILE_ENTRY_STRUCT.size  # 32 bytes per file entry
     data_start_offset = header_size + file_table_size
     
-    current_offset = data_start_offset
-    for i, file_info in enumerate(file_info_list):
-        file_info['offset'] = current_offset
-        current_offset += len(file_info['data']) * 4  # 4 bytes per float
+    # Offsets are a running sum of payload sizes; int64 so a >4 GiB bundle is caught, not wrapped
+    data_sizes = np.array([info['values'] for info in file_info_list], dtype=np.int64) * SAMPLE_BYTES[sample_format]
+    offsets = data_start_offset + np.concatenate(([0], np.cumsum(data_sizes[:-1])))
+    
+    total_size = int(offsets[-1] + data_sizes[-1])
+    if total_size >= 2**32:
+        print(f"Error: Bundle would be {total_size:,} bytes, offsets must fit in uint32 (< 4 GiB)")
+        return False
+    
+    for file_info, offset in zip(file_info_list, offsets):
+        file_info['offset'] = int(offset)
     
     # Write binary file
     print(f"Writing binary file: {output_file}")
     
-    with open(output_file, 'wb') as f:
-        # Write header
-        f.write(MAGIC_HEADER)                           # Magic: 'PICO'
-        f.write(struct.pack('<I', VERSION))             # Version
-        f.write(struct.pack('<I', len(file_info_list))) # File count
-        f.write(struct.pack('<I', sample_rate))         # Sample rate
-        
-        # Write file table
-        for file_info in file_info_list:
-            # File name (16 bytes, null-terminated)
-            name_bytes = file_info['name'].encode('utf-8')[:15]
-            name_padded = name_bytes + b'\x00' * (16 - len(name_bytes))
-            f.write(name_padded)
+    # Build header + file table in one buffer so the metadata is a single write
+    metadata = bytearray(data_start_offset)
+    HEADER_STRUCT.pack_into(metadata, 0, MAGIC_HEADER, bundle_version(sample_format),
+                            len(file_info_list), sample_rate)
+    for i, file_info in enumerate(file_info_list):
+        # File name (16 bytes, null-terminated; struct pads with zeros)
+        name_bytes = file_info['name'].encode('utf-8')[:15]
+        FILE_ENTRY_STRUCT.pack_into(
+            metadata, header_size + i * FILE_ENTRY_STRUCT.size,
+            name_bytes,
+            file_info['offset'],
+            file_info['samples'],
+            file_info['duration'],
+            SAMPLE_FORMATS[sample_format]
+        )
+    
+    decode = partial(wav_to_float_array, sample_rate=sample_rate, normalize=normalize,
+                     max_length_ms=max_length_ms, force_mono=force_mono)
+    workers = jobs if jobs is not None else os.cpu_count()
+    
+    try:
+        with open(output_file, 'wb') as f, ProcessPoolExecutor(max_workers=workers) as executor:
+            f.write(metadata)
             
-            # File data
-            f.write(struct.pack('<I', file_info['offset']))     # Offset
-            f.write(struct.pack('<I', file_info['samples']))    # Sample count
-            f.write(struct.pack('<f', file_info['duration']))   # Duration
-            f.write(struct.pack('<I', 0))                       # Reserved
-        
-        # Write audio data
-        for file_info in file_info_list:
-            for sample in file_info['data']:
-                f.write(struct.pack('<f', sample))
+            def write_next(pending):
+                """Wait for the oldest decode and append its samples to the binary"""
+                file_info, future = pending.popleft()
+                print(f"Processing: {file_info['path']}")
+                try:
+                    (_, audio_data, sr, was_truncated, original_duration,
+                     value_range, normalized_range) = future.result()
+                except Exception as e:
+                    # The file table is already on disk, so a failed file can't be dropped any more
+                    executor.shutdown(cancel_futures=True)
+                    raise RuntimeError(f"Error processing {file_info['path']}: {e!r}") from e
+                
+                print(f"  Channels: {'Mono' if force_mono else 'Original'}")
+                print(f"  Length: {len(audio_data)} samples ({len(audio_data)/sr:.2f}s)")
+                if was_truncated:
+                    print(f"  Truncated from {original_duration:.2f}s to {max_length_ms/1000.0:.2f}s")
+                    print(f"  ** TRUNCATED ** (was longer than {max_length_ms}ms)")
+                print(f"  Range: [{value_range[0]:.3f}, {value_range[1]:.3f}]")
+                if normalized_range is not None:
+                    print(f"  Normalized to: [{normalized_range[0]:.3f}, {normalized_range[1]:.3f}]")
+                
+                encode_samples(audio_data, sample_format).tofile(f)
+            
+            # Decode in parallel but write in table order, holding at most a couple of
+            # decoded files per worker in memory regardless of bundle size
+            pending = deque()
+            for file_info in file_info_list:
+                future = executor.submit(decode, file_info['path'], num_frames=file_info['frames'])
+                pending.append((file_info, future))
+                if len(pending) >= 2 * workers:
+                    write_next(pending)
+            
+            while pending:
+                write_next(pending)
+    
+    except Exception as e:
+        # Decode failures (including a crashed worker pool) leave a binary whose header
+        # promises data that was never written, so don't leave it behind
+        print(f"Error: {e}")
+        if os.path.exists(output_file):
+            os.remove(output_file)
+            print(f"Removed incomplete binary: {output_file}")
+        return False
     
     # Print summary
-    total_size = os.path.getsize(output_file)
     total_duration = sum(info['duration'] for info in file_info_list)
     
     print(f"\nBinary file created successfully!")
@@ -200,6 +319,7 @@ def create_multi_audio_binary(folder_path, output_file, sample_rate=44100, norma
     print(f"Total duration: {total_duration:.2f} seconds")
     print(f"Sample rate: {sample_rate} Hz")
     print(f"Audio format: {'Mono' if force_mono else 'Original channels'}")
+    print(f"Sample format: {sample_format} ({SAMPLE_BYTES[sample_format]} bytes per sample)")
     
     if max_length_ms is not None:
         print(f"Length limit: {max_length_ms}ms")
@@ -219,106 +339,212 @@ def create_multi_audio_binary(folder_path, output_file, sample_rate=44100, norma
         truncated_marker = " [TRUNCATED]" if info['was_truncated'] else ""
         print(f"  [{i}] {info['name']}: {info['samples']} samples, {info['duration']:.2f}s{truncated_marker}")
     
-    return True
+    # Same shape as read_bundle_info, so the generators needn't re-read the binary
+    return {
+        'version': bundle_version(sample_format),
+        'file_count': len(file_info_list),
+        'sample_rate': sample_rate,
+        'names': [info['name'] for info in file_info_list],
+        'sample_format': sample_format,
+        'file_size': total_size,
+    }
+
+# C header pieces for generate_c_defines
+C_DEFINES_HEADER_TEMPLATE = """\
+// Auto-generated multi-audio defines for flash-loaded data
+// Files: {file_count}, Sample Rate: {sample_rate} Hz
+// Load with: picotool load -x {binary_name} -o 0x{flash_address:08x}
+
+#ifndef MULTI_AUDIO_FLASH_H
+#define MULTI_AUDIO_FLASH_H
+
+#include <stdint.h>
 
-def generate_c_defines(binary_file, output_file, flash_address=0x10200000):
+// Flash memory configuration
+#define AUDIO_FLASH_ADDRESS    0x{flash_address:08x}U
+#define AUDIO_MAGIC            0x4F434950U  // 'PICO'
+#define AUDIO_VERSION          {version}U
+#define AUDIO_FILE_COUNT       {file_count}U
+#define AUDIO_SAMPLE_RATE      {sample_rate}U
+#define AUDIO_BINARY_SIZE      {file_size}U
+
+// Sample format
+#define AUDIO_FORMAT_F32       0U  // float32
+#define AUDIO_FORMAT_I16       1U  // int16 PCM
+#define AUDIO_FORMAT_BF16      2U  // bfloat16 (upper 16 bits of a float)
+#define AUDIO_SAMPLE_FORMAT    AUDIO_FORMAT_{sample_format}
+#define AUDIO_SAMPLE_BYTES     {sample_bytes}U
+typedef {sample_type} audio_sample_t;
+
+"""
+
+C_DEFINES_BF16_HELPER = """\
+// Expand a stored bfloat16 sample to float
+static inline float audio_bf16_to_float(uint16_t v) {
+    union { uint32_t u; float f; } x = { (uint32_t)v << 16 };
+    return x.f;
+}
+
+"""
+
+C_DEFINES_STRUCTS = """\
+// Binary format structures
+typedef struct {
+    uint32_t magic;        // 'PICO' magic number
+    uint32_t version;      // Format version
+    uint32_t file_count;   // Number of audio files
+    uint32_t sample_rate;  // Sample rate in Hz
+} audio_header_t;
+
+typedef struct {
+    char name[16];         // Null-terminated filename
+    uint32_t offset;       // Offset to audio data
+    uint32_t sample_count; // Number of samples
+    float duration;        // Duration in seconds
+    uint32_t sample_format; // Sample format (AUDIO_FORMAT_*)
+} audio_file_entry_t;
+
+"""
+
+C_DEFINES_FOOTER = """\
+// Base flash address (pointers calculated at runtime)
+#define AUDIO_BINARY_BASE      ((const uint8_t*)AUDIO_FLASH_ADDRESS)
+#define AUDIO_SAMPLES(entry)   ((const audio_sample_t*)(AUDIO_BINARY_BASE + (entry)->offset))
+
+#endif // MULTI_AUDIO_FLASH_H
+"""
+
+C_SAFE_NAME_TABLE = str.maketrans({' ': '_', '-': '_'})
+
+def read_bundle_info(binary_file):
+    """
+    Read header and file table of a multi-audio binary
+    
+    The file is memory-mapped and parsed with struct.unpack_from, so the
+    file table is read without a syscall per entry.
+    
+    Returns:
+        dict: version, file_count, sample_rate, names, sample_format, file_size
+              (None if the file is not a valid bundle)
+    """
+    with open(binary_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < HEADER_STRUCT.size:
+            print(f"Error: {binary_file} is too small to be an audio bundle")
+            return None
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, file_count, sample_rate = HEADER_STRUCT.unpack_from(mm, 0)
+            if magic != MAGIC_HEADER:
+                print(f"Error: Invalid magic header in {binary_file}")
+                return None
+            
+            if version not in (VERSION, VERSION_SAMPLE_FORMATS):
+                print(f"Error: Unsupported bundle version {version} in {binary_file}")
+                return None
+            
+            if len(mm) < HEADER_STRUCT.size + file_count * FILE_ENTRY_STRUCT.size:
+                print(f"Error: Truncated file table in {binary_file}")
+                return None
+            
+            # Read file table for names and sample format
+            file_names = []
+            sample_format_code = SAMPLE_FORMATS['f32']
+            for i in range(file_count):
+                entry_offset = HEADER_STRUCT.size + i * FILE_ENTRY_STRUCT.size
+                name_bytes, _, _, _, sample_format_code = FILE_ENTRY_STRUCT.unpack_from(mm, entry_offset)
+                file_names.append(name_bytes.rstrip(b'\x00').decode('utf-8'))
+            
+            file_size = len(mm)
+    
+    # Version 1 predates sample formats; its last entry field is reserved and always float32
+    if version == VERSION:
+        sample_format_code = SAMPLE_FORMATS['f32']
+    
+    sample_format = next((name for name, code in SAMPLE_FORMATS.items() if code == sample_format_code), None)
+    if sample_format is None:
+        print(f"Error: Unknown sample format {sample_format_code} in {binary_file}")
+        return None
+    
+    return {
+        'version': version,
+        'file_count': file_count,
+        'sample_rate': sample_rate,
+        'names': file_names,
+        'sample_format': sample_format,
+        'file_size': file_size,
+    }
+
+def generate_c_defines(binary_file, output_file, flash_address=0x10200000, info=None):
     """
     Generate C header with defines and structures for multi-audio binary
+    
+    Pass the metadata returned by create_multi_audio_binary as info to skip
+    re-reading the binary.
     """
     
     print(f"Generating C defines header: {output_file}")
     
-    # Read header to get file count and sample rate
-    with open(binary_file, 'rb') as f:
-        magic = f.read(4)
-        if magic != MAGIC_HEADER:
-            print(f"Error: Invalid magic header in {binary_file}")
+    if info is None:
+        info = read_bundle_info(binary_file)
+        if info is None:
             return False
-        
-        version = struct.unpack('<I', f.read(4))[0]
-        file_count = struct.unpack('<I', f.read(4))[0]
-        sample_rate = struct.unpack('<I', f.read(4))[0]
-        
-        # Read file table for names
-        file_names = []
-        for i in range(file_count):
-            name_bytes = f.read(16)
-            name = name_bytes.rstrip(b'\x00').decode('utf-8')
-            file_names.append(name)
-            f.read(16)  # Skip rest of file entry
-        
-        f.seek(0, 2)  # Seek to end
-        file_size = f.tell()
     
-    with open(output_file, 'w') as f:
-        f.write(f"// Auto-generated multi-audio defines for flash-loaded data\n")
-        f.write(f"// Files: {file_count}, Sample Rate: {sample_rate} Hz\n")
-        f.write(f"// Load with: picotool load -x {os.path.basename(binary_file)} -o 0x{flash_address:08x}\n\n")
-        f.write(f"#ifndef MULTI_AUDIO_FLASH_H\n")
-        f.write(f"#define MULTI_AUDIO_FLASH_H\n\n")
-        f.write(f"#include <stdint.h>\n\n")
-        
-        # Constants
-        f.write(f"// Flash memory configuration\n")
-        f.write(f"#define AUDIO_FLASH_ADDRESS    0x{flash_address:08x}U\n")
-        f.write(f"#define AUDIO_MAGIC            0x4F434950U  // 'PICO'\n")
-        f.write(f"#define AUDIO_VERSION          {version}U\n")
-        f.write(f"#define AUDIO_FILE_COUNT       {file_count}U\n")
-        f.write(f"#define AUDIO_SAMPLE_RATE      {sample_rate}U\n")
-        f.write(f"#define AUDIO_BINARY_SIZE      {file_size}U\n\n")
-        
-        # Structures
-        f.write(f"// Binary format structures\n")
-        f.write(f"typedef struct {{\n")
-        f.write(f"    uint32_t magic;        // 'PICO' magic number\n")
-        f.write(f"    uint32_t version;      // Format version\n")
-        f.write(f"    uint32_t file_count;   // Number of audio files\n")
-        f.write(f"    uint32_t sample_rate;  // Sample rate in Hz\n")
-        f.write(f"}} audio_header_t;\n\n")
-        
-        f.write(f"typedef struct {{\n")
-        f.write(f"    char name[16];         // Null-terminated filename\n")
-        f.write(f"    uint32_t offset;       // Offset to audio data\n")
-        f.write(f"    uint32_t sample_count; // Number of samples\n")
-        f.write(f"    float duration;        // Duration in seconds\n")
-        f.write(f"    uint32_t reserved;     // Reserved for future use\n")
-        f.write(f"}} audio_file_entry_t;\n\n")
-        
-        # File indices
-        f.write(f"// File indices (for easy access)\n")
-        for i, name in enumerate(file_names):
-            safe_name = name.upper().replace(' ', '_').replace('-', '_')
-            f.write(f"#define AUDIO_{safe_name}_INDEX {i}U\n")
-        f.write(f"\n")
-        
-        # Pointers (now just base address - pointers calculated at runtime)
-        f.write(f"// Base flash address (pointers calculated at runtime)\n")
-        f.write(f"#define AUDIO_BINARY_BASE      ((const uint8_t*)AUDIO_FLASH_ADDRESS)\n\n")
-        
-        f.write(f"#endif // MULTI_AUDIO_FLASH_H\n")
+    version = info['version']
+    file_count = info['file_count']
+    sample_rate = info['sample_rate']
+    file_names = info['names']
+    sample_format = info['sample_format']
+    file_size = info['file_size']
+    sample_type = {'f32': 'float', 'i16': 'int16_t', 'bf16': 'uint16_t'}[sample_format]
+    
+    # Assemble the whole header in memory and write it once
+    parts = [C_DEFINES_HEADER_TEMPLATE.format(
+        binary_name=os.path.basename(binary_file),
+        flash_address=flash_address,
+        version=version,
+        file_count=file_count,
+        sample_rate=sample_rate,
+        file_size=file_size,
+        sample_format=sample_format.upper(),
+        sample_bytes=SAMPLE_BYTES[sample_format],
+        sample_type=sample_type,
+    )]
+    if sample_format == 'bf16':
+        parts.append(C_DEFINES_BF16_HELPER)
+    parts.append(C_DEFINES_STRUCTS)
+    
+    # File indices
+    parts.append("// File indices (for easy access)\n")
+    for i, name in enumerate(file_names):
+        safe_name = name.upper().translate(C_SAFE_NAME_TABLE)
+        parts.append(f"#define AUDIO_{safe_name}_INDEX {i}U\n")
+    parts.append("\n")
+    
+    parts.append(C_DEFINES_FOOTER)
+    Path(output_file).write_text("".join(parts))
     
     print(f"C defines header generated with {file_count} files")
     return True
 
-def generate_picotool_script(binary_file, output_file, flash_address=0x10200000):
+def generate_picotool_script(binary_file, output_file, flash_address=0x10200000, info=None):
     """
     Generate shell script for loading binary with picotool
+    
+    Pass the metadata returned by create_multi_audio_binary as info to skip
+    re-reading the binary.
     """
     
     print(f"Generating picotool script: {output_file}")
     
     # Read basic info
-    with open(binary_file, 'rb') as f:
-        magic = f.read(4)
-        if magic != MAGIC_HEADER:
-            print(f"Error: Invalid magic header")
+    if info is None:
+        info = read_bundle_info(binary_file)
+        if info is None:
             return False
-        
-        version = struct.unpack('<I', f.read(4))[0]
-        file_count = struct.unpack('<I', f.read(4))[0]
-        sample_rate = struct.unpack('<I', f.read(4))[0]
-        f.seek(0, 2)
-        file_size = f.tell()
+    
+    file_count = info['file_count']
+    sample_rate = info['sample_rate']
+    file_size = info['file_size']
     
     with open(output_file, 'w') as f:
         f.write(f"#!/bin/bash\n")
@@ -352,6 +578,9 @@ def main():
     parser.add_argument('--no-normalize', action='store_true', help='Skip normalization')
     parser.add_argument('--max-length', type=int, help='Maximum file length in milliseconds (e.g., 30000 for 30 seconds)')
     parser.add_argument('--stereo', action='store_true', help='Keep stereo files (default: convert to mono)')
+    parser.add_argument('--dtype', choices=list(SAMPLE_FORMATS), default='f32',
+                        help='Sample format: f32, i16 or bf16 (default: f32)')
+    parser.add_argument('-j', '--jobs', type=int, help='Number of decode worker processes (default: one per CPU)')
     
     args = parser.parse_args()
     
@@ -360,6 +589,11 @@ def main():
         print(f"Error: Folder '{args.folder}' does not exist")
         return 1
     
+    # Check worker count
+    if args.jobs is not None and args.jobs < 1:
+        print(f"Error: --jobs must be at least 1 (got {args.jobs})")
+        return 1
+    
     # Determine output filename
     if args.output:
         output_file = args.output
@@ -374,24 +608,27 @@ def main():
         flash_address = int(args.address)
     
     # Create multi-audio binary
-    if not create_multi_audio_binary(
+    bundle_info = create_multi_audio_binary(
         args.folder, 
         output_file, 
         sample_rate=args.rate,
         normalize=not args.no_normalize,
         max_length_ms=args.max_length,
-        force_mono=not args.stereo
-    ):
+        force_mono=not args.stereo,
+        jobs=args.jobs,
+        sample_format=args.dtype
+    )
+    if not bundle_info:
         return 1
     
     # Generate C defines header if requested
     if args.c_defines:
-        if not generate_c_defines(output_file, args.c_defines, flash_address):
+        if not generate_c_defines(output_file, args.c_defines, flash_address, info=bundle_info):
             return 1
     
     # Generate picotool script if requested  
     if args.script:
-        if not generate_picotool_script(output_file, args.script, flash_address):
+        if not generate_picotool_script(output_file, args.script, flash_address, info=bundle_info):
             return 1
     
     print(f"\nSuccess! Use the binary with your Pi Pico audio player.")